@@ -1 +1,15 @@
-MIN_FILE_SIZE = 10_000_000
\ No newline at end of file
+MIN_FILE_SIZE = 10_000_000
+
+# On-disk decoded frame cache, None to disable
+FRAME_CACHE_DIR = None
+FRAME_CACHE_MAX_SIZE = 20_000_000_000 # bytes, shared by all cached videos
+FRAME_CACHE_SCALE = 1.0 # resolution factor of the cached frames
+
+# Near-duplicate label frames, None to disable
+DEDUP_THRESHOLD = None # max differing bits out of 64 between frame hashes
+DEDUP_HISTORY = 50 # recent frames kept per label to compare with
+
+# Tail mode, follow videos still being recorded
+TAIL_MODE = False
+FOLLOW_INTERVAL = 2 # sec between checks of the file size
+FOLLOW_TIMEOUT = 30 # sec without growth before a video is considered finished
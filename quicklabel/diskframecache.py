@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import time
+
+import numpy as np
+import cv2
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+from quicklabel.config import *
+
+FRAMES_FILE = "frames.dat"
+INDEX_FILE = "index.dat"
+META_FILE = "meta.json"
+LOCK_FILE = "lock"
+CHUNK_FRAMES = 256 # frames.dat grows by this many frames at a time
+IN_USE_TIMEOUT = 60 # sec, a cache touched more recently than this is never evicted
+TOUCH_INTERVAL = 10 # sec between touches of a cache in use
+
+
+def lock_file(f):
+    """
+    Non-blocking exclusive lock on an open file, released when the file is
+    closed or the process dies
+    returns False if another process holds it
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def is_locked(path):
+    try:
+        with open(path / LOCK_FILE, "a") as f:
+            return not lock_file(f)
+    except OSError:
+        return False
+
+
+class DiskFrameCache:
+    """
+    Memory-mapped file of decoded frames of a video, kept between sessions.
+    Every cached video lives in its own folder of cache_dir, the least
+    recently used ones are deleted when the total size goes above max_size.
+    Frames are stored in the order they are decoded and the index maps a
+    frame number to its slot, so the file only grows with the frames cached.
+    Only the process holding the lock of a video writes to its cache, the
+    others open it read-only.
+    """
+
+    def __init__(self, video_path, frame_count, frame_shape,
+                 cache_dir=None, max_size=None, scale=None):
+        self.cache_dir = pathlib.Path(cache_dir or FRAME_CACHE_DIR)
+        self.max_size = max_size or FRAME_CACHE_MAX_SIZE
+        self.scale = scale or FRAME_CACHE_SCALE
+        self.frame_count = frame_count
+        self.frame_shape = tuple(frame_shape)
+        height, width, channel = self.frame_shape
+        self.cached_shape = (max(1, int(height * self.scale)),
+                             max(1, int(width * self.scale)),
+                             channel)
+        self.frame_bytes = int(np.prod(self.cached_shape))
+        self.full = False
+
+        stat = os.stat(video_path)
+        self.meta = {
+            "video_path": str(pathlib.Path(video_path).resolve()),
+            "video_size": stat.st_size,
+            "video_mtime": stat.st_mtime,
+            "frame_count": self.frame_count,
+            "cached_shape": self.cached_shape,
+        }
+        key = hashlib.sha1(
+            "{}_{}".format(self.meta["video_path"], self.scale).encode()
+        ).hexdigest()
+        self.path = self.cache_dir / key
+        self._open()
+        self.others_size = self._evict()
+
+    def _open(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lock = open(self.path / LOCK_FILE, "a")
+        self.read_only = not lock_file(self.lock)
+        self.index = None
+        self.frames = None
+        self.capacity = 0
+        self.slot_count = 0
+        self.last_touch = time.time()
+
+        meta_path = self.path / META_FILE
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            meta["cached_shape"] = tuple(meta["cached_shape"])
+        except (OSError, ValueError, KeyError):
+            meta = None
+
+        if self.read_only:
+            logging.debug("Frame cache of {} in use, opened read-only".format(self.meta["video_path"]))
+            self.full = True
+            if meta == self.meta and (self.path / INDEX_FILE).exists():
+                self.index = np.memmap(self.path / INDEX_FILE, dtype=np.int32,
+                                       mode="r", shape=(self.frame_count,))
+                if (self.path / FRAMES_FILE).exists():
+                    self._map_frames(os.path.getsize(self.path / FRAMES_FILE) // self.frame_bytes)
+            return
+
+        if meta is not None and meta != self.meta: # Video changed since it was cached
+            logging.debug("Invalidating frame cache of {}".format(self.meta["video_path"]))
+            for name in [INDEX_FILE, FRAMES_FILE]:
+                if (self.path / name).exists():
+                    os.remove(self.path / name)
+
+        mode = "r+" if (self.path / INDEX_FILE).exists() else "w+"
+        self.index = np.memmap(self.path / INDEX_FILE, dtype=np.int32,
+                               mode=mode, shape=(self.frame_count,))
+        if (self.path / FRAMES_FILE).exists():
+            self._map_frames(os.path.getsize(self.path / FRAMES_FILE) // self.frame_bytes)
+        self.index[self.index > self.capacity] = 0 # Slots lost by an interrupted run
+        self.slot_count = int(self.index.max(initial=0))
+        with open(meta_path, "w") as f:
+            json.dump(self.meta, f)
+
+    def _map_frames(self, capacity):
+        """
+        Map frames.dat with room for capacity frames, growing the file if needed
+        """
+        if self.frames is not None:
+            self.frames.flush()
+        self.frames = None
+        if capacity == 0:
+            return
+        if self.read_only:
+            mode = "r"
+        else:
+            mode = "r+" if (self.path / FRAMES_FILE).exists() else "w+"
+        self.frames = np.memmap(self.path / FRAMES_FILE, dtype=np.uint8,
+                                mode=mode, shape=(capacity,) + self.cached_shape)
+        self.capacity = capacity
+
+    @property
+    def size(self):
+        return self.capacity * self.frame_bytes
+
+    def _touch(self):
+        """
+        Mark the cache as recently used, for the LRU order and so other
+        processes do not evict it
+        """
+        if time.time() - self.last_touch > TOUCH_INTERVAL:
+            self.last_touch = time.time()
+            os.utime(self.path / META_FILE)
+
+    def _evict(self):
+        """
+        Delete least recently used videos until the cache fits in max_size,
+        caches in use by another process are left alone
+        returns the size used by the other videos
+        """
+        others = []
+        for path in self.cache_dir.iterdir():
+            if path == self.path:
+                continue
+            try:
+                last_used = (path / META_FILE).stat().st_mtime
+                size = os.path.getsize(path / FRAMES_FILE) if (path / FRAMES_FILE).exists() else 0
+            except OSError:
+                continue
+            others.append((last_used, size, path))
+
+        others_size = sum(size for _, size, _ in others)
+        for last_used, size, path in sorted(others, key=lambda x: x[0]):
+            if others_size + self.size + CHUNK_FRAMES * self.frame_bytes <= self.max_size:
+                break
+            if time.time() - last_used < IN_USE_TIMEOUT or is_locked(path):
+                continue
+            logging.debug("Evicting frame cache {}".format(path))
+            shutil.rmtree(path, ignore_errors=True)
+            others_size -= size
+        return others_size
+
+    def __contains__(self, frame_number):
+        # A read-only cache only sees the slots that existed when it was opened
+        return (self.index is not None
+                and 0 <= frame_number < self.frame_count
+                and 0 < self.index[frame_number] <= self.capacity)
+
+    def __getitem__(self, frame_number):
+        if frame_number not in self:
+            raise KeyError(frame_number)
+        self._touch()
+        frame = np.array(self.frames[self.index[frame_number] - 1])
+        if self.cached_shape != self.frame_shape:
+            frame = cv2.resize(frame, (self.frame_shape[1], self.frame_shape[0]))
+        return frame
+
+    def __setitem__(self, frame_number, frame):
+        if self.full or frame_number in self or not 0 <= frame_number < self.frame_count:
+            return
+        if frame.shape != self.frame_shape:
+            logging.debug("Frame {} of shape {} not cached".format(frame_number, frame.shape))
+            return
+        if self.slot_count == self.capacity:
+            chunk_bytes = CHUNK_FRAMES * self.frame_bytes
+            if self.others_size + self.size + chunk_bytes > self.max_size:
+                self.others_size = self._evict()
+                if self.others_size + self.size + chunk_bytes > self.max_size:
+                    logging.debug("Frame cache full")
+                    self.full = True
+                    return
+            self._map_frames(self.capacity + CHUNK_FRAMES)
+        self._touch()
+        if self.cached_shape != self.frame_shape:
+            frame = cv2.resize(frame, (self.cached_shape[1], self.cached_shape[0]),
+                               interpolation=cv2.INTER_AREA)
+        self.frames[self.slot_count] = frame
+        self.slot_count += 1
+        self.index[frame_number] = self.slot_count
+
+    def close(self):
+        if not self.read_only:
+            if self.frames is not None:
+                self.frames.flush()
+            self.index.flush()
+        del self.frames
+        del self.index
+        self.lock.close()
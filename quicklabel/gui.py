@@ -7,7 +7,7 @@ import time
 
 import numpy as np
 import pkg_resources
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QImage, QPixmap
 from PyQt5.QtWidgets import (QAction, QApplication, QDesktopWidget, QDialog,
                              QFileDialog, QHBoxLayout, QLabel, QMainWindow,
@@ -17,6 +17,7 @@ import cv2
 from quicklabel.config import *
 from quicklabel.predictprocess import PredictProcess, Manager, Event, FASTAI
 from quicklabel.imagereaderprocess import ImageReaderProcess
+from quicklabel.videowriterprocess import CODECS
 
 FONT = cv2.FONT_HERSHEY_SIMPLEX
 
@@ -33,6 +34,8 @@ class quickLabelGUI(QMainWindow):
             "quicklabel.images", "ic_insert_drive_file_black_48dp_1x.png"
         )
         self.setWindowIcon(QIcon(window_icon))
+        self.tail_mode = TAIL_MODE
+        self.batch_folder = None
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -85,7 +88,14 @@ class quickLabelGUI(QMainWindow):
         self.file_sub_menu.addAction(self.open_batch_action)
         self.file_sub_menu.addAction(self.exit_action)
         self.file_sub_menu.addAction(self.record_label_to_file_action)
+        self.tail_mode_action = QAction("Tail mode", self)
+        self.tail_mode_action.setStatusTip("Follow videos still being recorded.")
+        self.tail_mode_action.setCheckable(True)
+        self.tail_mode_action.setChecked(self.tail_mode)
+        self.tail_mode_action.toggled.connect(self.set_tail_mode)
+
         self.file_sub_menu.addAction(self.predict_on_video_action)
+        self.file_sub_menu.addAction(self.tail_mode_action)
         
 
     def help_menu(self):
@@ -114,7 +124,16 @@ class quickLabelGUI(QMainWindow):
         if not folderpath:
             return
 
-        self.batch = []
+        self.batch_folder = folderpath
+        self.batch = self.scan_batch_folder(folderpath)
+
+        if len(self.batch) > 0:
+            self.load_file(self.batch.pop())
+        elif self.tail_mode:
+            self.watch_batch_folder()
+
+    def scan_batch_folder(self, folderpath):
+        batch = []
         files = folderpath.glob("*.mp4")
         files = sorted(files)
         already_labelled_files = set([x.stem.split('_frame_')[0] for x in (folderpath / 'label').glob('*.jpeg')])
@@ -123,10 +142,36 @@ class quickLabelGUI(QMainWindow):
         for file in files:
             if os.path.getsize(folderpath / file) > MIN_FILE_SIZE:
                 if (folderpath / file).stem not in already_labelled_files:
-                    self.batch.append(str(folderpath / file))
-
+                    batch.append(str(folderpath / file))
+                elif self.tail_mode and self.grown_since_labelled(folderpath / file):
+                    batch.append(str(folderpath / file))
+        return batch
+
+    def grown_since_labelled(self, file):
+        """
+        True if the video changed after its label file was written, it is
+        then loaded again from its last labelled frame
+        """
+        label_file = file.parent / "label" / (file.stem + ".txt")
+        return label_file.exists() and os.path.getmtime(file) > os.path.getmtime(label_file)
+
+    def watch_batch_folder(self):
+        """
+        In tail mode, look for new videos in the batch folder until one
+        is big enough to be loaded
+        """
+        if not self.tail_mode or self.batch_folder is None or self.filename is not None:
+            return
+        self.batch = self.scan_batch_folder(self.batch_folder)
         if len(self.batch) > 0:
             self.load_file(self.batch.pop())
+        else:
+            self.status_bar.showMessage("Waiting for new videos")
+            QTimer.singleShot(FOLLOW_INTERVAL * 1000, self.watch_batch_folder)
+
+    def set_tail_mode(self, checked):
+        self.tail_mode = checked
+        self.watch_batch_folder()
 
 
     def record_label_to_file(self):
@@ -137,8 +182,12 @@ class quickLabelGUI(QMainWindow):
 
     def predict_on_video_open(self):
         filename, accepted = QFileDialog.getOpenFileName(self, "Open File")
-        if accepted:
-            self.predict_on_video(filename)
+        if not accepted:
+            return
+        output_path, codec = QFileDialog.getSaveFileName(
+            self, "Save Annotated Video", "output.avi", ";;".join(CODECS))
+        if output_path:
+            self.predict_on_video(filename, output_path, CODECS.get(codec, "DIVX"))
 
 
 class AboutDialog(QDialog):
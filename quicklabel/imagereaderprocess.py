@@ -1,39 +1,90 @@
-from multiprocessing import Process, Manager, Event, Queue
+from multiprocessing import Process, Manager, Event, Queue, Value
 import cv2
 import time
 import logging
 import numpy as np
 import queue
 import gc
+import os
+
+from quicklabel.config import *
+from quicklabel.diskframecache import DiskFrameCache
 
 TIMEOUT = 15 #sec
 MAXFRAMEBUFFER = 1000
 
 class ImageReaderProcess(Process):
-    def __init__(self, video_path):
+    def __init__(self, video_path, use_disk_cache=None, num_threads=None, follow=False):
         super().__init__()
         self.video_path = video_path
-        self.image_managed_dict = Manager().dict()
+        self.num_threads = num_threads
+        self.follow = follow
+        if use_disk_cache is None:
+            use_disk_cache = FRAME_CACHE_DIR is not None
+        if follow: # The cache of a growing video is invalidated on every reopen
+            use_disk_cache = False
+        self.use_disk_cache = use_disk_cache
+        manager = Manager()
+        self.image_managed_dict = manager.dict()
         self.stop_event = Event()
         self.to_grab_queue = Queue(maxsize=1_000_000)
-        self.last_frame = Manager().Value('i', 999999)
+        self.last_frame = manager.Value('i', 999999)
+        self.fps = Value('d', 0.0)
+        self.live = Value('b', follow and self._recently_modified())
 
     def run(self):
-        cap = cv2.VideoCapture(self.video_path)
+        if self.num_threads is not None:
+            cv2.setNumThreads(self.num_threads)
+        cap = self._open_capture()
+        self.fps.value = cap.get(cv2.CAP_PROP_FPS)
         self.last_frame.value = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))-1
+        if self.follow:
+            self.last_frame.value = self._probe_last_frame(cap, self.last_frame.value)
+        disk_cache = None
+        if self.use_disk_cache and self.last_frame.value >= 0:
+            ret, frame = cap.read() # Decoded size, the metadata ignores rotation
+            if ret:
+                disk_cache = DiskFrameCache(self.video_path, self.last_frame.value+1, frame.shape)
+        file_stat = self._file_stat()
+        last_check = time.time()
+        last_growth = file_stat[1]
         while not self.stop_event.is_set():
+            if self.follow and time.time() - last_check > FOLLOW_INTERVAL:
+                last_check = time.time()
+                if self._file_stat() != file_stat: # Reopen to see the new frames
+                    file_stat = self._file_stat()
+                    last_growth = last_check
+                    cap.release()
+                    cap = self._open_capture()
+                    self.last_frame.value = self._probe_last_frame(
+                        cap, max(self.last_frame.value, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))-1))
+                    self.live.value = True
+                elif last_check - last_growth > FOLLOW_TIMEOUT:
+                    self.live.value = False
+
             try:
                 frame_to_grab = self.to_grab_queue.get(timeout=1)
             except queue.Empty:
                 continue
             if frame_to_grab in self.image_managed_dict.keys():
                 continue
-            
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_to_grab)
-            for i in range(30): # Read ahead of the ask
-                ret, frame = cap.read()
-                if ret:
-                    self.image_managed_dict[frame_to_grab+i] = frame
+
+            if disk_cache is not None and frame_to_grab in disk_cache:
+                for i in range(30): # Read ahead of the ask, from the disk cache
+                    if frame_to_grab+i not in disk_cache:
+                        break
+                    self.image_managed_dict[frame_to_grab+i] = disk_cache[frame_to_grab+i]
+            else:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_to_grab)
+                for i in range(30): # Read ahead of the ask
+                    ret, frame = cap.read()
+                    if ret:
+                        self.image_managed_dict[frame_to_grab+i] = frame
+                        if disk_cache is not None:
+                            disk_cache[frame_to_grab+i] = frame
+                    elif i == 0: # Frame count overestimated, or not written yet on a growing video
+                        self.last_frame.value = frame_to_grab-1
+                        break
 
             if len(self.image_managed_dict.keys()) > MAXFRAMEBUFFER: # Clear memory of earlier frames
                 keys = sorted(self.image_managed_dict.keys())
@@ -42,7 +93,39 @@ class ImageReaderProcess(Process):
                 gc.collect()
 
         cap.release()
+        if disk_cache is not None:
+            disk_cache.close()
+
+
+    def _open_capture(self):
+        """
+        Open the video, limiting the decoder threads when the backend allows it
+        """
+        if self.num_threads is not None and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+            return cv2.VideoCapture(self.video_path, cv2.CAP_ANY,
+                                    [cv2.CAP_PROP_N_THREADS, self.num_threads])
+        return cv2.VideoCapture(self.video_path)
+
+    def _probe_last_frame(self, cap, last_frame):
+        """
+        Read past last_frame, the frame count of a video being recorded is
+        often not updated or only estimated
+        returns the last frame found
+        """
+        cap.set(cv2.CAP_PROP_POS_FRAMES, last_frame+1)
+        grabbed = False
+        while cap.grab():
+            grabbed = True
+        if grabbed: # The position stays exact where seeking is approximate
+            last_frame = max(last_frame, int(cap.get(cv2.CAP_PROP_POS_FRAMES))-1)
+        return last_frame
+
+    def _file_stat(self):
+        stat = os.stat(self.video_path)
+        return stat.st_size, stat.st_mtime
 
+    def _recently_modified(self):
+        return time.time() - os.path.getmtime(self.video_path) < FOLLOW_TIMEOUT
 
     def __getitem__(self, key):
         if key > self.last_frame.value:
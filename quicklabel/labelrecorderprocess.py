@@ -1,19 +1,45 @@
-from multiprocessing import Process, Manager, Event, Queue
+from multiprocessing import Process, Event, Queue, Value
+from collections import deque
 import queue
 import cv2
+import os
 import time
 import logging
 import pathlib
 
+import numpy as np
+
+from quicklabel.config import *
+
+HASH_SIZE = 8
+
+
+def perceptual_hash(frame):
+    """
+    Difference hash of the frame, a 64 bits int where each bit tells if a
+    pixel of the downscaled gray frame is brighter than its left neighbour
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (HASH_SIZE+1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
 
 class LabelRecorderProcess(Process):
-    def __init__(self, filename):
+    def __init__(self, filename, dedup_threshold=None):
         super().__init__()
         self.label_queue = Queue()
         self.stop_event = Event()
         path = pathlib.Path(filename)
         path.parent.joinpath("label").mkdir(exist_ok=True)
         self.basepath = path.parent.joinpath("label") / path.stem
+        self.duplicates_path = path.parent.joinpath("label") / (path.stem + "_duplicates.csv")
+        if dedup_threshold is None:
+            dedup_threshold = DEDUP_THRESHOLD
+        self.dedup_threshold = dedup_threshold
+        self.recent_hashes = {}
+        self.duplicate_count = Value('i', 0)
+        self.saved_bytes = Value('q', 0)
 
     def run(self):
         while not self.stop_event.is_set() or not self.label_queue.empty():
@@ -22,17 +48,50 @@ class LabelRecorderProcess(Process):
                 self._record_label(frame_number, label, frame)
             except queue.Empty:
                 time.sleep(0.1)
+        if self.duplicate_count.value:
+            logging.info('{} duplicate frames not written, {:.1f} MB saved'.format(
+                self.duplicate_count.value, self.saved_bytes.value / 1e6))
 
     def record(self, frame_number, label, frame):
         self.label_queue.put((frame_number, label, frame))
 
-    def _record_label(self, frame_number, label, frame):
-        logging.debug('Writing frame {} to file'.format(frame_number))
-        path = (str(self.basepath)
+    def _frame_path(self, frame_number, label):
+        return (str(self.basepath)
             + "_frame_"
             + str(frame_number)
             + "_label_"
             + label
             + ".jpeg"
         )
-        cv2.imwrite(path, frame)
\ No newline at end of file
+
+    def _find_duplicate(self, label, frame_hash):
+        for reference_hash, reference_frame in self.recent_hashes.get(label, []):
+            if bin(frame_hash ^ reference_hash).count('1') <= self.dedup_threshold:
+                return reference_frame
+        return None
+
+    def _record_label(self, frame_number, label, frame):
+        if self.dedup_threshold is not None:
+            frame_hash = perceptual_hash(frame)
+            reference_frame = self._find_duplicate(label, frame_hash)
+            if reference_frame is not None:
+                self._record_duplicate(frame_number, label, reference_frame)
+                return
+            self.recent_hashes.setdefault(
+                label, deque(maxlen=DEDUP_HISTORY)).appendleft((frame_hash, frame_number))
+
+        logging.debug('Writing frame {} to file'.format(frame_number))
+        cv2.imwrite(self._frame_path(frame_number, label), frame)
+
+    def _record_duplicate(self, frame_number, label, reference_frame):
+        logging.debug('Frame {} is a duplicate of frame {}'.format(frame_number, reference_frame))
+        new_file = not self.duplicates_path.exists()
+        with open(self.duplicates_path, "a") as f:
+            if new_file:
+                f.write("Frame, Label, Reference\n")
+            f.write("{},{},{}\n".format(frame_number, label, reference_frame))
+        self.duplicate_count.value += 1
+        try:
+            self.saved_bytes.value += os.path.getsize(self._frame_path(reference_frame, label))
+        except OSError:
+            pass
@@ -1,5 +1,9 @@
-from multiprocessing import Process, Manager, Event, cpu_count
+from multiprocessing import Process, Manager, Event, Value, cpu_count
+import io
 import os
+import csv
+import time
+import pathlib
 import logging
 
 FASTAI = False
@@ -15,21 +19,28 @@ except ModuleNotFoundError:
 
 
 class PredictProcess(Process):
-    def __init__(self, model_path, video_path, image_reader_process):
+    def __init__(self, model_path, video_path, image_reader_process,
+                 num_threads=None, checkpoint_path=None):
         super().__init__()
         self.model_path = model_path
         self.video_path = video_path
+        self.num_threads = num_threads
+        self.checkpoint_path = checkpoint_path
+        self.frames_done = Value('q', 0)
         self.learn = None
         self.running = False
         self.managed_dict = Manager().dict()
         self.image_reader_process = image_reader_process
         self.stop_event = Event()
-        self.finished = False
+        self.finished = Value('b', False)
     
     def prepare_model(self):
         try:
             self.learn = load_learner(*os.path.split(self.model_path))
-            torch.set_num_threads(int(max(1, np.floor(0.8*cpu_count()))))
+            if self.num_threads is None:
+                torch.set_num_threads(int(max(1, np.floor(0.8*cpu_count()))))
+            else:
+                torch.set_num_threads(self.num_threads)
         except FileNotFoundError:
             logging.warning('DL model not found')
             return False
@@ -37,10 +48,12 @@ class PredictProcess(Process):
         return True
 
     def run(self):
-        self.prepare_model()
-        frame_number = 0
-        self.finished = False
-        while not self.stop_event.is_set() and not self.finished:
+        if not self.prepare_model():
+            self.finished.value = True # No prediction will come
+            return
+        frame_number = self.load_checkpoint()
+        self.finished.value = False
+        while not self.stop_event.is_set() and not self.finished.value:
             im_batch = []
             im_batch_frame_number = []
             for _ in range(0, BATCH_SIZE):
@@ -48,8 +61,10 @@ class PredictProcess(Process):
                 if frame is not None:
                     im_batch_frame_number.append(frame_number)
                     im_batch.append(frame)
+                elif self.image_reader_process.live.value:
+                    break # Live edge of a growing video, wait for new frames
                 else:
-                    self.finished = True
+                    self.finished.value = True
                     logging.debug("finished DL process")
                 frame_number += SKIP
 
@@ -58,8 +73,69 @@ class PredictProcess(Process):
 
                 for frame_n, label, prob in zip(im_batch_frame_number, labels, probs):
                     self.managed_dict[frame_n] = (label, prob)
+                self.frames_done.value += len(im_batch)
+                self.save_checkpoint(im_batch_frame_number, labels, probs)
                 logging.debug("processed image {}".format(frame_number))
+            elif not self.finished.value:
+                time.sleep(0.5)
+        if self.finished.value and self.checkpoint_path is not None:
+            self.done_path().touch()
         logging.debug("Quitting DL process")
+
+    def done_path(self):
+        return pathlib.Path(self.checkpoint_path).with_suffix('.done')
+
+    def load_checkpoint(self):
+        """
+        Reload the predictions already saved in the checkpoint, dropping the
+        line cut by an interrupted run and any malformed row
+        returns the frame number to resume from
+        """
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, 'rb+') as f:
+            content = f.read()
+            f.truncate(content.rfind(b'\n') + 1) # Trim the partial last line
+        if not content.count(b'\n'):
+            os.remove(self.checkpoint_path)
+            return 0
+
+        frame_number = 0
+        with open(self.checkpoint_path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            classes = header[2:]
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                try:
+                    frame_n = int(row[0])
+                    proba = dict(zip(classes, map(float, row[2:])))
+                except ValueError:
+                    continue
+                self.managed_dict[frame_n] = (row[1], proba)
+                frame_number = max(frame_number, frame_n + SKIP)
+        logging.debug("Resuming {} at frame {}".format(self.video_path, frame_number))
+        return frame_number
+
+    def save_checkpoint(self, frame_numbers, labels, probs):
+        """
+        Append a whole batch at once and sync it, so an interruption loses
+        at most the last batch
+        """
+        if self.checkpoint_path is None:
+            return
+        classes = self.learn.data.classes
+        lines = io.StringIO()
+        writer = csv.writer(lines)
+        if not os.path.exists(self.checkpoint_path):
+            writer.writerow(['Frame', 'Label'] + list(classes))
+        for frame_n, label, prob in zip(frame_numbers, labels, probs):
+            writer.writerow([frame_n, label] + ['{:.4f}'.format(prob[c]) for c in classes])
+        with open(self.checkpoint_path, 'a', newline='') as f:
+            f.write(lines.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
             
 
     def predict(self, frame):
@@ -0,0 +1,161 @@
+from multiprocessing import cpu_count
+import argparse
+import os
+import sys
+import pathlib
+import logging
+import time
+
+import pkg_resources
+
+from quicklabel.config import *
+from quicklabel.predictprocess import PredictProcess, FASTAI
+from quicklabel.imagereaderprocess import ImageReaderProcess
+
+REPORT_INTERVAL = 10 #sec
+DECODE_SHARE = 0.25 # Part of the cores of a job given to decoding
+
+
+class PredictJob:
+    def __init__(self, video_path, model_path, num_cores, follow=False):
+        self.video_path = video_path
+        path = pathlib.Path(video_path)
+        path.parent.joinpath("label").mkdir(exist_ok=True)
+        self.checkpoint_path = path.parent.joinpath("label") / (path.stem + "_predictions.csv")
+        decode_threads = max(1, int(num_cores * DECODE_SHARE))
+        self.image_reader_process = ImageReaderProcess(
+            video_path, num_threads=decode_threads, follow=follow)
+        self.prediction_process = PredictProcess(
+            model_path, video_path, self.image_reader_process,
+            num_threads=max(1, num_cores - decode_threads),
+            checkpoint_path=self.checkpoint_path)
+
+    def start(self):
+        self.image_reader_process.start()
+        self.prediction_process.start()
+
+    def is_alive(self):
+        return self.prediction_process.is_alive()
+
+    def stop(self):
+        for proc in [self.prediction_process, self.image_reader_process]:
+            proc.stop_event.set()
+            proc.join()
+
+    def succeeded(self):
+        return (self.prediction_process.exitcode == 0
+                and self.prediction_process.done_path().exists())
+
+    @property
+    def frames_done(self):
+        return self.prediction_process.frames_done.value
+
+
+class PredictScheduler:
+    """
+    Predict on every video of a folder, running n_jobs videos at once.
+    The cores are split evenly between the jobs and, in each job, between
+    decoding and inference. Progress is checkpointed in the label folder so
+    an interrupted run resumes where it stopped. With follow, videos still
+    being recorded are predicted up to their live edge and the folder is
+    watched for new videos until interrupted.
+    """
+
+    def __init__(self, folderpath, model_path=None, n_jobs=None, n_cores=None, follow=None):
+        self.folderpath = pathlib.Path(folderpath)
+        if model_path is None:
+            model_path = pkg_resources.resource_filename("models", "cnn1.pkl")
+        self.model_path = model_path
+        self.n_cores = n_cores or cpu_count()
+        self.n_jobs = n_jobs or max(1, self.n_cores // 4)
+        self.cores_per_job = max(1, self.n_cores // self.n_jobs)
+        self.follow = TAIL_MODE if follow is None else follow
+
+    def pending_videos(self):
+        """
+        Videos not predicted yet, biggest first so the long jobs do not end
+        up running alone at the end of the run
+        """
+        videos = []
+        for file in self.folderpath.glob("*.mp4"):
+            if os.path.getsize(file) <= MIN_FILE_SIZE:
+                continue
+            done_path = self.folderpath / "label" / (file.stem + "_predictions.done")
+            if not done_path.exists() or os.path.getmtime(file) > os.path.getmtime(done_path):
+                videos.append(file) # Not predicted yet, or grew since
+        return [str(x) for x in sorted(videos, key=os.path.getsize, reverse=True)]
+
+    def run(self):
+        if not FASTAI:
+            logging.warning('Fastai not installed, nothing to predict')
+            return []
+
+        pending = self.pending_videos()
+        logging.info("{} videos to predict with {} jobs of {} cores".format(
+            len(pending), self.n_jobs, self.cores_per_job))
+        running = []
+        failed = []
+        frames_finished = 0
+        started = set(pending)
+        start_time = last_report = last_scan = time.time()
+        try:
+            while pending or running or self.follow:
+                if self.follow and time.time() - last_scan > FOLLOW_INTERVAL:
+                    last_scan = time.time()
+                    new_videos = [x for x in self.pending_videos() if x not in started]
+                    pending.extend(new_videos)
+                    started.update(new_videos)
+
+                while pending and len(running) < self.n_jobs:
+                    job = PredictJob(pending.pop(0), self.model_path, self.cores_per_job,
+                                     self.follow)
+                    job.start()
+                    running.append(job)
+
+                for job in [job for job in running if not job.is_alive()]:
+                    frames_finished += job.frames_done
+                    job.stop()
+                    running.remove(job)
+                    if job.succeeded():
+                        logging.info("Done predicting {}".format(job.video_path))
+                        started.discard(job.video_path) # Picked up again if it grows
+                    else:
+                        failed.append(job.video_path)
+                        logging.error("Failed predicting {} (exit code {})".format(
+                            job.video_path, job.prediction_process.exitcode))
+
+                if time.time() - last_report > REPORT_INTERVAL:
+                    last_report = time.time()
+                    logging.info(self.report(frames_finished, running, start_time))
+                time.sleep(0.5)
+        finally:
+            for job in running:
+                job.stop()
+        logging.info(self.report(frames_finished, running, start_time))
+        if failed:
+            logging.error("{} videos failed: {}".format(len(failed), ", ".join(failed)))
+        return failed
+
+    def report(self, frames_finished, running, start_time):
+        frames = frames_finished + sum(job.frames_done for job in running)
+        elapsed = time.time() - start_time
+        return "{} frames predicted in {:.0f}s, {:.1f} frames/sec".format(
+            frames, elapsed, frames / max(elapsed, 1e-6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict on every video of a folder")
+    parser.add_argument("folder")
+    parser.add_argument("--model", default=None, help="Path to the fastai model")
+    parser.add_argument("--jobs", type=int, default=None, help="Videos predicted at once")
+    parser.add_argument("--cores", type=int, default=None, help="Cores to use in total")
+    parser.add_argument("--follow", action="store_true", default=None,
+                        help="Follow videos still being recorded and watch for new ones")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    failed = PredictScheduler(args.folder, args.model, args.jobs, args.cores, args.follow).run()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
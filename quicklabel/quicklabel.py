@@ -28,6 +28,7 @@ from quicklabel.gui import quickLabelGUI
 from quicklabel.predictprocess import PredictProcess, Manager, Event, FASTAI
 from quicklabel.imagereaderprocess import ImageReaderProcess
 from quicklabel.labelrecorderprocess import LabelRecorderProcess
+from quicklabel.videowriterprocess import VideoWriterProcess
 
 FONT = cv2.FONT_HERSHEY_SIMPLEX
 
@@ -47,7 +48,9 @@ class quickLabel(quickLabelGUI):
         self.image_reader_process = None
         self.prediction_process = None
         self.label_recorder_process = None
+        self.video_writer_process = None
         self.current_frame_number = 0
+        self.waiting_for_frames = False
 
     def load_file(self, filename):
         self.filename = filename
@@ -56,11 +59,20 @@ class quickLabel(quickLabelGUI):
         
         if self.image_reader_process is not None:
             self.image_reader_process.stop_event.set()
-        self.image_reader_process = ImageReaderProcess(self.filename)
+        self.image_reader_process = ImageReaderProcess(self.filename, follow=self.tail_mode)
         self.image_reader_process.start()
         self.current_frame_number = 0
+        self.waiting_for_frames = False
         
         frame = self.image_reader_process[0]
+        if frame is None: # Nothing decodable yet, like a plain MP4 still being recorded
+            return self.skip_file(filename, "cannot be read yet")
+        resumed = False
+        if self.tail_mode: # Resume a video that grew after being labelled
+            labels = self.read_labels(filename)
+            if len(labels) > 0:
+                self.current_frame_number = labels[-1][0]
+                resumed = True
         self.frame = frame
         self.printed_frame = frame
         self.height, self.width, self.channel = frame.shape
@@ -84,13 +96,41 @@ class quickLabel(quickLabelGUI):
                 model_path, filename, self.image_reader_process)
             self.prediction_process.start()
 
-        self.display_next_image()
+        if not self.display_next_image():
+            if self.image_reader_process.live.value:
+                self.waiting_for_frames = True
+                self.status_bar.showMessage("Waiting for new frames", 2000)
+                return True
+            if resumed: # Changed without new frames, like a recording being finalised
+                self.write_labels_to_file(filename) # Not picked up again until it grows
+            return self.skip_file(filename, "has no new frames")
         if len(self.batch) > 0:
             self.status_bar.showMessage(
                 f"{self.filename}. {len(self.batch)} files to go"
             )
         else:
             self.status_bar.showMessage(f"{self.filename}.")
+        return True
+
+    def skip_file(self, filename, reason):
+        """
+        Stop the processes of a video that cannot be labelled and load the
+        next one
+        returns the result of loading the next video
+        """
+        logging.warning("{} {}".format(filename, reason))
+        for proc in [self.image_reader_process, self.prediction_process,
+                     self.label_recorder_process]:
+            if proc is not None:
+                proc.stop_event.set()
+        self.filename = None
+        self.waiting_for_frames = False
+        self.status_bar.showMessage(f"{filename} {reason}", 5000)
+        if len(self.batch) > 0:
+            return self.load_file(self.batch.pop())
+        if self.tail_mode: # Retry later, the file may change
+            QTimer.singleShot(FOLLOW_INTERVAL * 1000, self.watch_batch_folder)
+        return False
 
     def add_fast_ai_text(self, frame, label, proba):
         n = 0
@@ -123,9 +163,9 @@ class quickLabel(quickLabelGUI):
     def display_next_image(self):
         # Capture frame-by-frame
         frame = self.image_reader_process[self.current_frame_number]
-        self.frame = np.copy(frame)
         if frame is None:
             return False
+        self.frame = np.copy(frame)
 
         if (
             FASTAI
@@ -172,50 +212,94 @@ class quickLabel(quickLabelGUI):
         return True
 
 
-    def predict_on_video(self, filename):
+    def predict_on_video(self, filename, output_path="output.avi", fourcc="DIVX"):
         self.status_bar.showMessage("Predicting Only")
-        self.load_file(filename)
-        fourcc = cv2.VideoWriter_fourcc(*'DIVX')
-        self.out = cv2.VideoWriter('output.avi',fourcc, 24.0, (self.width, self.height)) 
+        if not self.load_file(filename):
+            return
+        if self.video_writer_process is not None:
+            self.video_writer_process.finish()
+            self.wait_for_video_writer(self.video_writer_process, message=None)
+        fps = self.image_reader_process.fps.value or 24.0
+        self.video_writer_process = VideoWriterProcess(
+            output_path, fourcc, fps, self.width, self.height)
+        self.video_writer_process.start()
         self.i = 0
         self.predict_next_timer()
 
     def predict_next_timer(self):
-        if self.i+1 in self.prediction_process.managed_dict.keys() or self.prediction_process.finished:
+        if not self.video_writer_process.can_write():
+            logging.debug('Waiting for the encoder')
+            QTimer.singleShot(10, self.predict_next_timer)
+        elif self.i+1 in self.prediction_process.managed_dict.keys() or self.prediction_process.finished.value:
             if self.display_next_image():
-                self.out.write(self.printed_frame)
+                frame_number = self.current_frame_number - 1
+                label, proba = self.prediction_process.managed_dict.get(frame_number, (None, None))
+                self.video_writer_process.write(self.frame, frame_number, label, proba,
+                                                len(self.image_reader_process))
                 logging.debug("Writing")
                 self.i += 1
                 QTimer.singleShot(10, self.predict_next_timer)
+            elif self.image_reader_process.live.value:
+                logging.debug('Waiting for new frames of the video')
+                QTimer.singleShot(1000, self.predict_next_timer)
             else:
-                self.out.release()
-                self.status_bar.showMessage("Done!")
+                self.video_writer_process.finish()
+                self.status_bar.showMessage("Encoding the end of the video")
+                self.wait_for_video_writer(self.video_writer_process)
         else:
             logging.debug('Waiting for image {} to be processed'.format(self.i))
             QTimer.singleShot(1000, self.predict_next_timer)
 
 
 
+    def wait_for_video_writer(self, process, message="Done!"):
+        """
+        Join the encoder once it has written its last frames, without
+        blocking the GUI
+        """
+        if process.is_alive():
+            QTimer.singleShot(100, lambda: self.wait_for_video_writer(process, message))
+        else:
+            process.join()
+            if message is not None:
+                self.status_bar.showMessage(message)
+
     def record_label_to_file(self):
         """Open a QFileDialog to allow the user to open a file into the application."""
         filename, accepted = QFileDialog.getOpenFileName(self, "Open File")
         if accepted:
             self.write_labels_to_file(filename)
 
+    def read_labels(self, filename):
+        """
+        Labels recorded for a video
+        returns a list of (frame_number, label) sorted by frame number
+        """
+        path = pathlib.Path(filename)
+        path = path.parent.joinpath("label") / path.stem
+        labels = []
+        for file in path.parent.glob(path.name + "_frame_*.jpeg"):
+            labels.append(
+                re.search(r"_frame_(\d*)_label_(.*)\.jpeg", str(file)).groups()
+            )
+            labels[-1] = (int(labels[-1][0]), labels[-1][1])
+        duplicates_path = path.parent / (path.name + "_duplicates.csv")
+        if duplicates_path.exists(): # Near-duplicate frames saved without image
+            with open(duplicates_path) as duplicates:
+                next(duplicates)
+                for line in duplicates:
+                    frame_number, label, _ = line.strip().split(",")
+                    labels.append((int(frame_number), label))
+        return sorted(labels, key=lambda tup: tup[0])
+
     def write_labels_to_file(self, filename):
         path = pathlib.Path(filename)
         path.parent.joinpath("label").mkdir(exist_ok=True)
         path = path.parent.joinpath("label") / (path.stem + ".txt")
 
+        labels = self.read_labels(filename)
         with open(path, "w") as f:
             f.write("Frame, Label\n")
-            labels = []
-            for file in path.parent.glob(path.stem + "*.jpeg"):
-                labels.append(
-                    re.search(r"_frame_(\d*)_label_(.*)\.jpeg", str(file)).groups()
-                )
-                labels[-1] = (int(labels[-1][0]), labels[-1][1])
-            labels = sorted(labels, key=lambda tup: tup[0])
             f.writelines([str(x) + "," + y + "\n" for x, y in labels])
 
     def keyPressEvent(self, e):
@@ -225,6 +309,7 @@ class quickLabel(quickLabelGUI):
                 self.current_frame_number -= 2
                 self.current_frame_number = max(0, self.current_frame_number)
                 self.last_label = None
+                self.waiting_for_frames = False
                 self.display_next_image()
                 return
 
@@ -237,6 +322,14 @@ class quickLabel(quickLabelGUI):
             if e.key() == Qt.Key_O:
                 label = "Other"
 
+            if label is not None and self.waiting_for_frames:
+                # Current frame already labelled, only try to move to the new frames
+                if self.display_next_image():
+                    self.waiting_for_frames = False
+                elif not self.image_reader_process.live.value:
+                    self.end_of_video()
+                return
+
             if label is not None:
                 self.last_label = label
                 self.label_recorder_process.record(
@@ -246,20 +339,44 @@ class quickLabel(quickLabelGUI):
                 )
 
                 if not self.display_next_image():
-                    # Video ended
-                    self.write_labels_to_file(self.filename)
-                    self.status_bar.showMessage("VideoEnded")
-                    self.filename = None
-                    if FASTAI:
-                        self.prediction_process.stop_event.set()
-                    if len(self.batch) > 0:
-                        self.load_file(self.batch.pop())
+                    if self.image_reader_process.live.value:
+                        # Live edge of a video still being recorded
+                        self.waiting_for_frames = True
+                        self.status_bar.showMessage("Waiting for new frames", 2000)
+                        return
+                    self.end_of_video()
+
+    def end_of_video(self):
+        """Write the labels of the finished video and load the next one."""
+        # Let the recorder write its last labels
+        self.label_recorder_process.stop_event.set()
+        self.label_recorder_process.join()
+        self.write_labels_to_file(self.filename)
+        if self.label_recorder_process.duplicate_count.value:
+            self.status_bar.showMessage("VideoEnded, {} duplicate frames, {:.1f} MB saved".format(
+                self.label_recorder_process.duplicate_count.value,
+                self.label_recorder_process.saved_bytes.value / 1e6))
+        else:
+            self.status_bar.showMessage("VideoEnded")
+        self.filename = None
+        self.waiting_for_frames = False
+        if FASTAI:
+            self.prediction_process.stop_event.set()
+        if len(self.batch) > 0:
+            self.load_file(self.batch.pop())
+        else:
+            self.watch_batch_folder()
 
     def closeEvent(self, event):
-        for proc in [self.image_reader_process, self.prediction_process, self.label_recorder_process]:
+        if self.video_writer_process is not None:
+            self.video_writer_process.finish()
+        for proc in [self.image_reader_process, self.prediction_process,
+                     self.label_recorder_process]:
             if proc is not None:
                 proc.stop_event.set()
                 proc.join()
+        if self.video_writer_process is not None:
+            self.video_writer_process.join()
 
 
 def main():
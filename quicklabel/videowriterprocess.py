@@ -0,0 +1,135 @@
+from multiprocessing import Process, Event, Queue, RawArray
+import ctypes
+import queue
+import logging
+
+import numpy as np
+import cv2
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+N_SLOTS = 8 # Frames in flight between the GUI and the encoder
+CODECS = {
+    "AVI (DIVX) (*.avi)": "DIVX",
+    "AVI (XVID) (*.avi)": "XVID",
+    "AVI (MJPG) (*.avi)": "MJPG",
+    "MP4 (mp4v) (*.mp4)": "mp4v",
+}
+
+
+class OverlayRenderer:
+    """
+    Draw the prediction overlay by blending text sprites rendered once
+    with cv2.putText instead of rendering the text on every frame
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.sprites = {}
+
+    def sprite(self, text, color, scale=1, thickness=2):
+        key = (text, color, scale, thickness)
+        if key not in self.sprites:
+            (text_width, text_height), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+            alpha = np.zeros((text_height + baseline + thickness, text_width + thickness), np.uint8)
+            cv2.putText(alpha, text, (0, text_height), FONT, scale, 255, thickness, cv2.LINE_AA)
+            alpha = alpha[:, :, None].astype(np.float32) / 255
+            self.sprites[key] = (alpha, alpha * np.array(color, np.float32), text_height)
+        return self.sprites[key]
+
+    def blend(self, frame, sprite, x, y):
+        """
+        Blend a sprite with its baseline at (x, y), like cv2.putText
+        returns the x coordinate after the sprite
+        """
+        alpha, colored, text_height = sprite
+        top = y - text_height
+        y0, x0 = max(0, top), max(0, x)
+        y1 = min(frame.shape[0], top + alpha.shape[0])
+        x1 = min(frame.shape[1], x + alpha.shape[1])
+        if y1 > y0 and x1 > x0:
+            a = alpha[y0-top:y1-top, x0-x:x1-x]
+            c = colored[y0-top:y1-top, x0-x:x1-x]
+            roi = frame[y0:y1, x0:x1]
+            roi[:] = roi * (1 - a) + c
+        return x + alpha.shape[1]
+
+    def text(self, frame, text, x, y, color, scale=1, thickness=2):
+        """
+        Blend a text one character at a time, so often changing texts like
+        frame numbers reuse the same few sprites
+        """
+        for char in text:
+            x = self.blend(frame, self.sprite(char, color, scale, thickness), x, y)
+
+    def draw(self, frame, frame_number, total, label, proba):
+        if proba is not None:
+            for n, (key, val) in enumerate(proba.items()):
+                color = (100, 255, 100) if key == label else (255, 255, 255)
+                y = self.height - 200 + n * 30
+                self.blend(frame, self.sprite("{:10s}".format(key), color), 10, y)
+                self.blend(frame, self.sprite(": {:.2f}".format(val), color), 150, y)
+                bar = frame[max(0, y-20):max(0, y), 260:260 + int(100 * val)]
+                bar[:] = color
+        self.text(frame, "{}/{}".format(frame_number, total),
+                  self.width - 250, self.height - 10, (255, 255, 255))
+        return frame
+
+
+class VideoWriterProcess(Process):
+    """
+    Encode the annotated output video outside of the GUI thread.
+    Frames are passed through a ring of shared memory slots, only the slot
+    number and the prediction go through the queue.
+    """
+
+    def __init__(self, output_path, fourcc, fps, width, height):
+        super().__init__()
+        self.output_path = output_path
+        self.fourcc = fourcc
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.frame_buffer = RawArray(ctypes.c_uint8, N_SLOTS * height * width * 3)
+        self.free_slots = Queue()
+        for slot in range(N_SLOTS):
+            self.free_slots.put(slot)
+        self.frame_queue = Queue()
+        self.stop_event = Event()
+
+    def slots(self):
+        return np.frombuffer(self.frame_buffer, dtype=np.uint8).reshape(
+            N_SLOTS, self.height, self.width, 3)
+
+    def can_write(self):
+        return not self.free_slots.empty()
+
+    def write(self, frame, frame_number, label=None, proba=None, total=0):
+        slot = self.free_slots.get()
+        self.slots()[slot] = frame
+        self.frame_queue.put((slot, frame_number, label, proba, total))
+
+    def finish(self):
+        """
+        Ask the encoder to stop once every frame already written is encoded
+        """
+        self.frame_queue.put(None)
+
+    def run(self):
+        writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                 self.fps, (self.width, self.height))
+        overlay = OverlayRenderer(self.width, self.height)
+        slots = self.slots()
+        while not self.stop_event.is_set(): # stop_event aborts, finish() ends cleanly
+            try:
+                item = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            slot, frame_number, label, proba, total = item
+            frame = np.copy(slots[slot])
+            self.free_slots.put(slot)
+            writer.write(overlay.draw(frame, frame_number, total, label, proba))
+        writer.release()
+        logging.debug("Done writing {}".format(self.output_path))
@@ -23,7 +23,8 @@ setup(
     package_data={'quicklabel.images': ['*.png'], 'models':['*.pkl']},
     entry_points={
         'console_scripts': [
-            'quickLabel=quicklabel.quicklabel:main'
+            'quickLabel=quicklabel.quicklabel:main',
+            'quickLabelPredict=quicklabel.predictscheduler:main',
         ]
     },
     install_requires=requirements,
@@ -0,0 +1,155 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from quicklabel import diskframecache
+from quicklabel.diskframecache import DiskFrameCache, META_FILE, FRAMES_FILE
+
+SHAPE = (8, 6, 3)
+FRAME_BYTES = 8 * 6 * 3
+
+
+@pytest.fixture
+def videos(tmp_path, monkeypatch):
+    """Fake video files, only their path, size and mtime matter to the cache."""
+    monkeypatch.setattr(diskframecache, "CHUNK_FRAMES", 4)
+    paths = []
+    for name in ["a.mp4", "b.mp4", "c.mp4"]:
+        path = tmp_path / name
+        path.write_bytes(b"video " + name.encode())
+        paths.append(str(path))
+    return paths
+
+
+def make_cache(video, tmp_path, max_size=100 * FRAME_BYTES, scale=1.0):
+    return DiskFrameCache(video, 20, SHAPE, cache_dir=tmp_path / "cache",
+                          max_size=max_size, scale=scale)
+
+
+def frame(value):
+    return np.full(SHAPE, value, np.uint8)
+
+
+def age(cache_path, seconds):
+    """Pretend a cache was last used some seconds ago."""
+    last_used = time.time() - seconds
+    os.utime(cache_path / META_FILE, (last_used, last_used))
+
+
+def test_round_trip(videos, tmp_path):
+    cache = make_cache(videos[0], tmp_path)
+    cache[5] = frame(5)
+    cache[2] = frame(2)
+    assert 5 in cache and 2 in cache
+    assert 3 not in cache and 20 not in cache
+    assert (cache[5] == 5).all() and (cache[2] == 2).all()
+    cache.close()
+
+    cache = make_cache(videos[0], tmp_path)
+    assert (cache[5] == 5).all() and (cache[2] == 2).all()
+    assert 3 not in cache
+    cache.close()
+
+
+def test_file_grows_with_cached_frames(videos, tmp_path):
+    cache = make_cache(videos[0], tmp_path)
+    cache[19] = frame(1)
+    assert os.path.getsize(cache.path / FRAMES_FILE) == 4 * FRAME_BYTES
+    for i in range(5):
+        cache[i] = frame(i)
+    assert os.path.getsize(cache.path / FRAMES_FILE) == 8 * FRAME_BYTES
+    cache.close()
+
+
+def test_reduced_resolution(videos, tmp_path):
+    cache = make_cache(videos[0], tmp_path, scale=0.5)
+    cache[0] = frame(7)
+    assert cache.frames.shape[1:] == (4, 3, 3)
+    assert cache[0].shape == SHAPE
+    cache.close()
+
+
+def test_wrong_shape_not_cached(videos, tmp_path):
+    cache = make_cache(videos[0], tmp_path)
+    cache[0] = np.zeros((6, 8, 3), np.uint8)
+    assert 0 not in cache
+    cache.close()
+
+
+def test_invalidated_when_video_changes(videos, tmp_path):
+    cache = make_cache(videos[0], tmp_path)
+    cache[0] = frame(1)
+    cache.close()
+
+    with open(videos[0], "ab") as f:
+        f.write(b"more frames")
+    cache = make_cache(videos[0], tmp_path)
+    assert 0 not in cache
+    cache.close()
+
+
+def test_lru_eviction(videos, tmp_path):
+    max_size = 8 * FRAME_BYTES
+    caches = []
+    for i, video in enumerate(videos[:2]):
+        cache = make_cache(video, tmp_path, max_size)
+        cache[0] = frame(i)
+        cache.close()
+        caches.append(cache.path)
+    age(caches[0], 1000)
+    age(caches[1], 500)
+
+    cache = make_cache(videos[2], tmp_path, max_size)
+    cache[0] = frame(2)
+    assert not caches[0].exists() # least recently used
+    assert caches[1].exists()
+    cache.close()
+
+
+def test_caches_in_use_not_evicted(videos, tmp_path):
+    max_size = 4 * FRAME_BYTES
+    other = make_cache(videos[0], tmp_path, max_size)
+    other[0] = frame(0)
+
+    cache = make_cache(videos[1], tmp_path, max_size)
+    cache[0] = frame(1)
+    assert other.path.exists()
+    assert 0 not in cache and cache.full
+    other.close()
+    cache.close()
+
+
+def test_second_opener_read_only(videos, tmp_path):
+    cache = make_cache(videos[0], tmp_path)
+    cache[10] = frame(10)
+    other = make_cache(videos[0], tmp_path)
+    assert other.read_only
+    assert (other[10] == 10).all()
+    other[15] = frame(15)
+    assert 15 not in other and 15 not in cache
+    cache[18] = frame(18)
+    assert (cache[10] == 10).all() and (cache[18] == 18).all()
+    other.close()
+    cache.close()
+
+    cache = make_cache(videos[0], tmp_path)
+    assert not cache.read_only
+    assert (cache[10] == 10).all() and (cache[18] == 18).all()
+    assert 15 not in cache
+    cache.close()
+
+
+def test_locked_caches_not_evicted(videos, tmp_path):
+    max_size = 4 * FRAME_BYTES
+    other = make_cache(videos[0], tmp_path, max_size)
+    other[0] = frame(0)
+    age(other.path, 1000)
+
+    cache = make_cache(videos[1], tmp_path, max_size)
+    cache[0] = frame(1)
+    assert other.path.exists()
+    assert cache.full
+    other.close()
+    cache.close()
@@ -0,0 +1,128 @@
+import os
+import time
+
+import numpy as np
+import cv2
+import pytest
+
+from quicklabel import imagereaderprocess
+from quicklabel.imagereaderprocess import ImageReaderProcess
+
+
+def write_video(path, frame_count):
+    """Write the video in full then swap it in, like a recorder flushing a segment."""
+    tmp_path = str(path) + ".tmp.avi"
+    writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"MJPG"), 12.0, (64, 48))
+    for i in range(frame_count):
+        writer.write(np.full((48, 64, 3), i * 10, np.uint8))
+    writer.release()
+    os.replace(tmp_path, str(path))
+
+
+def wait_for(condition, timeout=10):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.05)
+    return condition()
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    monkeypatch.setattr(imagereaderprocess, "FOLLOW_INTERVAL", 0.1)
+    monkeypatch.setattr(imagereaderprocess, "FOLLOW_TIMEOUT", 1)
+    path = tmp_path / "vid.avi"
+    write_video(path, 5)
+    return str(path)
+
+
+@pytest.fixture
+def reader_factory():
+    readers = []
+
+    def factory(*args, **kwargs):
+        reader = ImageReaderProcess(*args, **kwargs)
+        reader.start()
+        readers.append(reader)
+        return reader
+
+    yield factory
+    for reader in readers:
+        reader.stop_event.set()
+        reader.join()
+
+
+def test_follow_extends_last_frame(video, reader_factory):
+    reader = reader_factory(video, follow=True)
+    assert reader.live.value
+    assert reader[0] is not None
+    assert len(reader) == 4
+    assert reader[5] is None
+
+    write_video(video, 10)
+    assert wait_for(lambda: len(reader) == 9)
+    assert reader[8] is not None
+    assert reader.live.value
+
+
+def test_live_drops_without_growth(video, reader_factory):
+    reader = reader_factory(video, follow=True)
+    assert reader[0] is not None
+    assert wait_for(lambda: not reader.live.value)
+
+
+def test_finished_video_not_live(video, reader_factory):
+    old = time.time() - 60
+    os.utime(video, (old, old))
+    reader = reader_factory(video, follow=True)
+    assert not reader.live.value
+
+
+def test_without_follow(video, reader_factory):
+    reader = reader_factory(video)
+    assert not reader.live.value
+    assert reader[0] is not None
+    write_video(video, 10)
+    time.sleep(0.5)
+    assert len(reader) == 4
+
+
+def test_truncated_video(tmp_path, reader_factory):
+    """The frame count of a truncated video is higher than what decodes."""
+    path = tmp_path / "truncated.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 12.0, (64, 48))
+    for _ in range(40):
+        writer.write(np.random.randint(0, 255, (48, 64, 3), np.uint8))
+    writer.release()
+    content = path.read_bytes()
+    path.write_bytes(content[:len(content) // 2])
+
+    reader = reader_factory(str(path))
+    assert reader[0] is not None
+    assert reader[35] is None
+    assert len(reader) < 35
+
+
+def test_follow_appended_video(tmp_path, monkeypatch, reader_factory):
+    """Follow an MPEG stream appended to, whose frame count is only estimated."""
+    monkeypatch.setattr(imagereaderprocess, "FOLLOW_INTERVAL", 0.1)
+    full_path = str(tmp_path / "full.mpg")
+    writer = cv2.VideoWriter(full_path, cv2.VideoWriter_fourcc(*"mp2v"), 12.0, (64, 48))
+    for i in range(60):
+        writer.write(np.full((48, 64, 3), i * 4, np.uint8))
+    writer.release()
+    with open(full_path, "rb") as f:
+        content = f.read()
+
+    path = tmp_path / "recording.mpg"
+    path.write_bytes(content[:len(content) // 2])
+    reader = reader_factory(str(path), follow=True)
+    assert reader[0] is not None
+    first_last_frame = len(reader)
+    assert reader[first_last_frame] is not None
+
+    with open(path, "ab") as f:
+        f.write(content[len(content) // 2:])
+    # Seeking in an MPEG stream is approximate, so is the frame count
+    assert wait_for(lambda: len(reader) >= 55)
+    assert len(reader) > first_last_frame
+    assert reader[len(reader)] is not None
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from quicklabel.labelrecorderprocess import LabelRecorderProcess, perceptual_hash
+
+
+def gradient(noise=0, seed=0):
+    frame = np.tile(np.linspace(0, 255, 160), (120, 1))
+    frame = frame + np.random.RandomState(seed).normal(0, noise, frame.shape) if noise else frame
+    return np.repeat(np.clip(frame, 0, 255)[:, :, None], 3, axis=2).astype(np.uint8)
+
+
+def checkerboard():
+    frame = np.indices((120, 160)).sum(axis=0) // 20 % 2 * 255
+    return np.repeat(frame[:, :, None], 3, axis=2).astype(np.uint8)
+
+
+def distance(a, b):
+    return bin(perceptual_hash(a) ^ perceptual_hash(b)).count('1')
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    video = tmp_path / "vid.mp4"
+    video.touch()
+    recorder = LabelRecorderProcess(str(video), dedup_threshold=4)
+    return recorder
+
+
+def test_perceptual_hash():
+    assert perceptual_hash(gradient()) == perceptual_hash(gradient())
+    assert 0 <= perceptual_hash(gradient()) < 2 ** 64
+    assert distance(gradient(), gradient(noise=2)) <= 4
+    assert distance(gradient(), checkerboard()) > 16
+
+
+def test_find_duplicate_threshold(recorder):
+    recorder.recent_hashes["Other"] = [(0b1111, 3)]
+    assert recorder._find_duplicate("Other", 0b1111) == 3
+    assert recorder._find_duplicate("Other", 0b11110000_1111) == 3
+    assert recorder._find_duplicate("Other", 0b111110000_1111) is None
+    assert recorder._find_duplicate("Fight", 0b1111) is None
+
+
+def test_duplicates_recorded_as_reference(recorder, tmp_path):
+    recorder._record_label(1, "Other", gradient())
+    recorder._record_label(2, "Other", gradient(noise=2, seed=1))
+    recorder._record_label(3, "Fight", gradient())
+    recorder._record_label(4, "Other", checkerboard())
+
+    label_folder = tmp_path / "label"
+    assert sorted(x.name for x in label_folder.glob("*.jpeg")) == [
+        "vid_frame_1_label_Other.jpeg",
+        "vid_frame_3_label_Fight.jpeg",
+        "vid_frame_4_label_Other.jpeg",
+    ]
+    assert (label_folder / "vid_duplicates.csv").read_text() == "Frame, Label, Reference\n2,Other,1\n"
+    assert recorder.duplicate_count.value == 1
+    assert recorder.saved_bytes.value == (label_folder / "vid_frame_1_label_Other.jpeg").stat().st_size
+
+
+def test_dedup_disabled(tmp_path):
+    video = tmp_path / "vid.mp4"
+    video.touch()
+    recorder = LabelRecorderProcess(str(video))
+    recorder._record_label(1, "Other", gradient())
+    recorder._record_label(2, "Other", gradient())
+    assert len(list((tmp_path / "label").glob("*.jpeg"))) == 2
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from quicklabel.predictprocess import PredictProcess
+
+CLASSES = ["Explore", "Fight", "Other", "Stealth"]
+
+
+@pytest.fixture
+def process(tmp_path):
+    process = PredictProcess("model.pkl", "vid.mp4", None,
+                             checkpoint_path=tmp_path / "vid_predictions.csv")
+    process.learn = SimpleNamespace(data=SimpleNamespace(classes=CLASSES))
+    return process
+
+
+def probs(label):
+    return {c: (0.7 if c == label else 0.1) for c in CLASSES}
+
+
+def test_checkpoint_round_trip(process):
+    process.save_checkpoint([0, 1], ["Fight", "Other"], [probs("Fight"), probs("Other")])
+    process.save_checkpoint([2], ["Explore"], [probs("Explore")])
+
+    resumed = PredictProcess("model.pkl", "vid.mp4", None,
+                             checkpoint_path=process.checkpoint_path)
+    assert resumed.load_checkpoint() == 3
+    assert resumed.managed_dict[1][0] == "Other"
+    assert resumed.managed_dict[2][1] == pytest.approx(probs("Explore"))
+
+
+def test_no_checkpoint(process):
+    assert process.load_checkpoint() == 0
+
+
+def test_checkpoint_interrupted_mid_row(process):
+    process.save_checkpoint([0, 1], ["Fight", "Other"], [probs("Fight"), probs("Other")])
+    with open(process.checkpoint_path, "a") as f:
+        f.write("2,Explore,0.70")
+    assert process.load_checkpoint() == 2
+    assert 2 not in process.managed_dict.keys()
+
+    process.save_checkpoint([2], ["Explore"], [probs("Explore")])
+    assert process.load_checkpoint() == 3
+    assert process.managed_dict[2][0] == "Explore"
+
+
+def test_checkpoint_malformed_rows_skipped(process):
+    process.save_checkpoint([0], ["Fight"], [probs("Fight")])
+    with open(process.checkpoint_path, "a") as f:
+        f.write("x,Fight,0.1,0.1,0.1,0.1\n")
+        f.write("5,Fight,0.1\n")
+    assert process.load_checkpoint() == 1
+    assert list(process.managed_dict.keys()) == [0]
+
+
+def test_checkpoint_with_truncated_header(process):
+    with open(process.checkpoint_path, "w") as f:
+        f.write("Frame,La")
+    assert process.load_checkpoint() == 0
+    assert not process.checkpoint_path.exists()
+
+
+def test_finished_visible_from_parent(process, monkeypatch):
+    monkeypatch.setattr(process, "prepare_model", lambda: False)
+    process.start()
+    process.join(timeout=30)
+    assert process.finished.value
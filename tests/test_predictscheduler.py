@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+from quicklabel import predictscheduler
+from quicklabel.predictscheduler import PredictScheduler
+
+
+def make_video(folder, name, size):
+    path = folder / name
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+
+def test_pending_videos(tmp_path, monkeypatch):
+    monkeypatch.setattr(predictscheduler, "MIN_FILE_SIZE", 100)
+    small = make_video(tmp_path, "small.mp4", 50)
+    medium = make_video(tmp_path, "medium.mp4", 200)
+    big = make_video(tmp_path, "big.mp4", 400)
+    done = make_video(tmp_path, "done.mp4", 300)
+    make_video(tmp_path, "other.avi", 500)
+    (tmp_path / "label").mkdir()
+    (tmp_path / "label" / "done_predictions.done").touch()
+
+    scheduler = PredictScheduler(tmp_path, model_path="model.pkl", n_jobs=2, n_cores=8)
+    assert scheduler.pending_videos() == [big, medium]
+    assert scheduler.cores_per_job == 4
+
+
+def test_grown_videos_pending_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(predictscheduler, "MIN_FILE_SIZE", 100)
+    video = make_video(tmp_path, "growing.mp4", 200)
+    (tmp_path / "label").mkdir()
+    done_path = tmp_path / "label" / "growing_predictions.done"
+    done_path.touch()
+    old = os.path.getmtime(done_path) - 60
+    os.utime(video, (old, old))
+
+    scheduler = PredictScheduler(tmp_path, model_path="model.pkl")
+    assert scheduler.pending_videos() == []
+    with open(video, "ab") as f:
+        f.write(b"\0" * 100)
+    assert scheduler.pending_videos() == [video]
+
+
+def test_main_exit_code(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["quickLabelPredict", str(tmp_path)])
+    monkeypatch.setattr(PredictScheduler, "run", lambda self: [str(tmp_path / "vid.mp4")])
+    with pytest.raises(SystemExit) as exit:
+        predictscheduler.main()
+    assert exit.value.code == 1
+
+    monkeypatch.setattr(PredictScheduler, "run", lambda self: [])
+    with pytest.raises(SystemExit) as exit:
+        predictscheduler.main()
+    assert exit.value.code == 0
@@ -1,8 +1,14 @@
+import os
 import pytest
 import pkg_resources
 import shutil
 import time
+from multiprocessing import Value
 from os.path import join as pjoin
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
 
 
 from PyQt5.QtCore import Qt
@@ -87,3 +93,77 @@ def test_about_dialog(window, qtbot, mock):
     qtbot.keyClick(window.help_sub_menu, Qt.Key_Down)
     mock.patch.object(QDialog, 'exec_', return_value='accept')
     qtbot.keyClick(window.help_sub_menu, Qt.Key_Enter)
+
+
+def test_write_labels_with_duplicates(window, tmp_path):
+    """Frames recorded as near duplicates are listed in the label file."""
+    label_folder = tmp_path / "label"
+    label_folder.mkdir()
+    (label_folder / "vid_frame_3_label_Fight.jpeg").touch()
+    (label_folder / "vid_frame_1_label_Other.jpeg").touch()
+    (label_folder / "vid_duplicates.csv").write_text("Frame, Label, Reference\n2,Other,1\n")
+
+    window.write_labels_to_file(str(tmp_path / "vid.mp4"))
+
+    assert (label_folder / "vid.txt").read_text() == (
+        "Frame, Label\n1,Other\n2,Other\n3,Fight\n"
+    )
+
+
+def test_load_unreadable_file(window, tmp_path):
+    """A video with no decodable frame yet is skipped instead of crashing."""
+    video = tmp_path / "recording.mp4"
+    video.write_bytes(b"\0" * 1000)
+    assert not window.load_file(str(video))
+    assert window.filename is None
+
+
+def test_predict_finishes_encoding(window, monkeypatch):
+    """Once the prediction is finished and the video ended, the encoder is finished."""
+    finished = []
+    window.video_writer_process = SimpleNamespace(
+        can_write=lambda: True, finish=lambda: finished.append(True))
+    window.prediction_process = SimpleNamespace(managed_dict={}, finished=Value('b', True))
+    window.image_reader_process = SimpleNamespace(live=Value('b', False))
+    monkeypatch.setattr(window, "display_next_image", lambda: False)
+    monkeypatch.setattr(window, "wait_for_video_writer", lambda process: None)
+    window.i = 0
+    window.predict_next_timer()
+    assert finished
+    window.video_writer_process = window.prediction_process = window.image_reader_process = None
+
+
+def labelled_video(folder, age):
+    """A 5 frame video labelled up to its end, last modified age seconds ago."""
+    path = folder / "vid.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 12.0, (64, 48))
+    for i in range(5):
+        writer.write(np.full((48, 64, 3), i * 10, np.uint8))
+    writer.release()
+    (folder / "label").mkdir()
+    (folder / "label" / "vid_frame_5_label_Other.jpeg").touch()
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return str(path)
+
+
+def test_resume_without_new_frames(window, tmp_path):
+    """A finished video that changed without new frames is skipped."""
+    video = labelled_video(tmp_path, age=600)
+    window.tail_mode = True
+    assert not window.load_file(video)
+    assert window.filename is None
+    label_file = tmp_path / "label" / "vid.txt"
+    assert label_file.read_text() == "Frame, Label\n5,Other\n"
+    assert not window.grown_since_labelled(tmp_path / "vid.avi")
+    window.tail_mode = False
+
+
+def test_resume_waits_on_live_video(window, tmp_path):
+    """A video still being recorded waits for its new frames."""
+    video = labelled_video(tmp_path, age=0)
+    window.tail_mode = True
+    assert window.load_file(video)
+    assert window.waiting_for_frames
+    assert len(list((tmp_path / "label").glob("*.jpeg"))) == 1
+    window.tail_mode = False
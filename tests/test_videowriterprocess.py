@@ -0,0 +1,53 @@
+import numpy as np
+import cv2
+
+from quicklabel.videowriterprocess import OverlayRenderer, VideoWriterProcess
+
+WIDTH, HEIGHT = 320, 240
+PROBA = {"Explore": 0.1, "Fight": 0.7, "Other": 0.1, "Stealth": 0.1}
+
+
+def test_overlay_draws_prediction():
+    overlay = OverlayRenderer(WIDTH, HEIGHT)
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    overlay.draw(frame, 12, 100, "Fight", PROBA)
+    assert frame.dtype == np.uint8 and frame.shape == (HEIGHT, WIDTH, 3)
+    fight_row = frame[HEIGHT - 200 + 30 - 20:HEIGHT - 200 + 30]
+    assert (fight_row[:, :150] == (100, 255, 100)).all(axis=2).any() # Highlighted label
+    assert (fight_row[:, 260:330] == (100, 255, 100)).all() # Probability bar
+    assert frame[HEIGHT - 30:, WIDTH - 250:].any() # Frame counter
+
+
+def test_overlay_reuses_sprites():
+    overlay = OverlayRenderer(WIDTH, HEIGHT)
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    overlay.draw(frame, 11, 100, "Fight", PROBA)
+    sprite_count = len(overlay.sprites)
+    overlay.draw(frame, 10, 101, "Fight", PROBA)
+    assert len(overlay.sprites) == sprite_count
+
+
+def test_overlay_clipped_to_frame():
+    overlay = OverlayRenderer(100, 50) # Smaller than the overlay layout
+    frame = np.zeros((50, 100, 3), np.uint8)
+    overlay.draw(frame, 1, 10, "Fight", PROBA)
+    overlay.text(frame, "1234", -10, 5, (255, 255, 255))
+
+
+def test_video_writer_process(tmp_path):
+    output_path = str(tmp_path / "output.avi")
+    writer = VideoWriterProcess(output_path, "MJPG", 12.0, WIDTH, HEIGHT)
+    writer.start()
+    for i in range(20):
+        frame = np.full((HEIGHT, WIDTH, 3), i * 10, np.uint8)
+        writer.write(frame, i, "Fight", PROBA, total=20)
+    writer.finish()
+    writer.join(timeout=30)
+    assert writer.exitcode == 0
+
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 20
+    assert cap.get(cv2.CAP_PROP_FPS) == 12.0
+    assert int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) == WIDTH
+    assert int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) == HEIGHT
+    cap.release()